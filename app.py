@@ -2,9 +2,17 @@ import streamlit as st
 from pytubefix import YouTube
 import os
 import subprocess
-import re
 import time
+import threading
+import queue
+import tempfile
+import shutil
+from concurrent.futures import ThreadPoolExecutor, wait
+from collections import deque
 from pathlib import Path
+from string import Template
+import requests
+from requests.adapters import HTTPAdapter
 
 # --- Page Config ---
 st.set_page_config(page_title="Zenith 4K Downloader", page_icon="⚡", layout="centered")
@@ -20,14 +28,12 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- Helper: Format Bytes ---
+_POWER_LABELS = ('', 'K', 'M', 'G', 'T')
+
 def format_bytes(size):
-    power = 2**10
-    n = 0
-    power_labels = {0 : '', 1: 'K', 2: 'M', 3: 'G', 4: 'T'}
-    while size > power:
-        size /= power
-        n += 1
-    return f"{size:.1f} {power_labels[n]}B"
+    # Unit index straight from the bit length (each unit is 10 bits) instead of a division loop
+    n = min(max(0, (int(size).bit_length() - 1) // 10), 4)
+    return f"{size / (1 << (10 * n)):.1f} {_POWER_LABELS[n]}B"
 
 # --- Helper: Download Monitor Class ---
 class DownloadMonitor:
@@ -35,68 +41,372 @@ class DownloadMonitor:
         self.bar = None
         self.text = None
         self.total_size = 0
-        self.last_time = 0
+        self.total_str = format_bytes(0)
+        self.last_ns = 0
         self.last_bytes = 0
+        self._last_pct_int = -1
+        # Pre-built status markup; each tick only substitutes the dynamic fields
+        self._tmpl = Template(
+            '<span style="color:#4CAF50"><b>Downloading... $pct%</b></span><br>'
+            '<span class="info-text">📦 $dl / $tot | ⚡ $sp/s</span>'
+        )
 
     def set_ui(self, bar, text, total_size):
         self.bar = bar
         self.text = text
         self.total_size = total_size
-        self.last_time = time.time()
+        self.total_str = format_bytes(total_size) # Static for the whole download
+        self.last_ns = time.monotonic_ns()
         self.last_bytes = total_size # bytes_remaining starts at total
+        self._last_pct_int = -1
 
     def on_progress(self, stream, chunk, bytes_remaining):
         if not self.bar: return
-        
-        current_time = time.time()
-        # Update UI every 0.1s to avoid freezing
-        if current_time - self.last_time > 0.1 or bytes_remaining == 0:
-            
-            # Calculate Progress
-            downloaded = self.total_size - bytes_remaining
-            pct = downloaded / self.total_size if self.total_size > 0 else 0
-            
-            # Calculate Speed
-            time_diff = current_time - self.last_time
-            bytes_diff = self.last_bytes - bytes_remaining
-            
-            speed = 0
-            if time_diff > 0:
-                speed = bytes_diff / time_diff # Bytes per second
-            
-            # Update Streamlit UI
+
+        # Coalesce updates into 50ms ticks; every re-render costs Streamlit a websocket round-trip
+        now_ns = time.monotonic_ns()
+        if now_ns - self.last_ns < 50_000_000 and bytes_remaining != 0:
+            return
+
+        # Calculate Progress
+        downloaded = self.total_size - bytes_remaining
+        pct = downloaded / self.total_size if self.total_size > 0 else 0
+        pct_int = int(pct * 100)
+
+        # Calculate Speed
+        time_diff = (now_ns - self.last_ns) / 1e9
+        bytes_diff = self.last_bytes - bytes_remaining
+        speed = bytes_diff / time_diff if time_diff > 0 else 0 # Bytes per second
+
+        # Update Streamlit UI (the bar only moves when the whole percent changes)
+        if pct_int != self._last_pct_int:
             self.bar.progress(min(pct, 1.0))
-            self.text.markdown(f"""
-                <span style="color:#4CAF50"><b>Downloading... {int(pct*100)}%</b></span><br>
-                <span class="info-text">📦 {format_bytes(downloaded)} / {format_bytes(self.total_size)} | ⚡ {format_bytes(speed)}/s</span>
-            """, unsafe_allow_html=True)
-            
-            # Update tracking vars
-            self.last_time = current_time
-            self.last_bytes = bytes_remaining
+            self._last_pct_int = pct_int
+        self.text.markdown(self._tmpl.substitute(
+            pct=pct_int, dl=format_bytes(downloaded), tot=self.total_str, sp=format_bytes(speed)
+        ), unsafe_allow_html=True)
+
+        # Update tracking vars
+        self.last_ns = now_ns
+        self.last_bytes = bytes_remaining
+
+# --- Helper: Parallel Range Downloader ---
+class DownloadCancelled(Exception):
+    pass
+
+class ByteCounter:
+    # Thread-safe running total shared by the download workers.
+    # Every add also offers (done, total) to a one-slot queue the UI drains;
+    # when the slot is taken the update is dropped so workers never block on rendering.
+    # Setting `cancelled` makes every worker sharing the counter stop at its next chunk.
+    def __init__(self, total=0):
+        self.value = 0
+        self.total = total
+        self.updates = queue.Queue(maxsize=1)
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def add(self, n):
+        with self._lock:
+            self.value += n
+            done = self.value
+        try:
+            self.updates.put_nowait((done, self.total))
+        except queue.Full:
+            pass
+
+# googlevideo throttles long-lived requests, so never ask for more than pytubefix's
+# own downloader does per request (9 MiB)
+SEGMENT_SIZE = 9 << 20
+SEGMENT_RETRIES = 3
+
+def _get_range(session, url, lo, hi, counter, write):
+    # A dropped connection resumes from the last byte received instead of
+    # failing the whole download; HTTP errors (403 etc.) are not retried
+    attempt = 0
+    while lo <= hi:
+        if counter.cancelled.is_set():
+            raise DownloadCancelled()
+        try:
+            # Closing the response on every exit returns its connection to the keep-alive pool
+            with session.get(url, headers={'Range': f'bytes={lo}-{hi}'}, stream=True, timeout=30) as resp:
+                resp.raise_for_status()
+                if resp.status_code != 206:
+                    raise IOError("Server does not support ranged downloads")
+                # 128 KiB network reads
+                for chunk in resp.iter_content(chunk_size=1 << 17):
+                    if counter.cancelled.is_set():
+                        raise DownloadCancelled()
+                    write(chunk)
+                    lo += len(chunk)
+                    counter.add(len(chunk))
+                if lo <= hi:
+                    raise requests.exceptions.ChunkedEncodingError("Connection closed mid-segment")
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+            attempt += 1
+            if attempt > SEGMENT_RETRIES:
+                raise
+            time.sleep(0.5 * attempt)
+
+def _download_range(session, url, out_path, lo, hi, counter):
+    # Each segment has its own handle and only ever touches its own byte slice;
+    # a 1 MiB write buffer keeps syscalls and fragmentation down
+    with open(out_path, 'r+b', buffering=1 << 20) as f:
+        f.seek(lo)
+        _get_range(session, url, lo, hi, counter, f.write)
+
+def preallocate_file(path, size):
+    # Reserve the full size up front so parallel writers don't interleave extents
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+    try:
+        if size and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(fd, 0, size)
+                return
+            except OSError:
+                pass # Filesystem without fallocate support
+        # Portable fallback: set the length and touch the last byte
+        os.ftruncate(fd, size)
+        if size:
+            os.lseek(fd, size - 1, os.SEEK_SET)
+            os.write(fd, b'\0')
+    finally:
+        os.close(fd)
+
+def ranged_download(session, url, total_size, out_path, parts=8, counter=None):
+    # Fixed-size segments queued on `parts` workers; pass a shared counter to
+    # aggregate progress across several downloads
+    # Pre-allocate so the segments can be written in any order
+    preallocate_file(out_path, total_size)
+
+    if counter is None:
+        counter = ByteCounter(total_size)
+    with ThreadPoolExecutor(max_workers=parts) as pool:
+        futures = [
+            pool.submit(_download_range, session, url, out_path, lo, min(lo + SEGMENT_SIZE, total_size) - 1, counter)
+            for lo in range(0, total_size, SEGMENT_SIZE)
+        ]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            counter.cancelled.set() # One failed segment fails the file: stop queued ones early
+            raise
+    return out_path
+
+def _fetch_range(session, url, lo, hi, counter):
+    data = bytearray()
+    _get_range(session, url, lo, hi, counter, data.extend)
+    return data
+
+def stream_ranged_download(session, url, total_size, out_file, parts=8, counter=None, segment_size=4 << 20):
+    # In-order variant for non-seekable targets (pipes): up to `parts` segments are
+    # fetched ahead in parallel and written strictly in sequence, so memory stays
+    # bounded at parts * segment_size
+    if counter is None:
+        counter = ByteCounter(total_size)
+    offsets = iter(range(0, total_size, segment_size))
+
+    with ThreadPoolExecutor(max_workers=parts) as pool:
+        def submit(lo):
+            return pool.submit(_fetch_range, session, url, lo, min(lo + segment_size, total_size) - 1, counter)
+
+        window = deque(submit(lo) for _, lo in zip(range(parts), offsets))
+        while window:
+            data = window.popleft().result()
+            lo = next(offsets, None)
+            if lo is not None:
+                window.append(submit(lo)) # Keep the window full while this write blocks
+            out_file.write(data)
+
+def is_sabr(stream):
+    # Formats with neither a URL nor a cipher only exist behind YouTube's SABR
+    # (server ABR) protocol; pytubefix points their .url at an endpoint that
+    # plain Range requests can't use
+    return getattr(stream, 'is_sabr', False)
+
+def stream_size(stream):
+    # Exact size for ranged downloads; SABR sizes only drive the progress bar
+    return stream.filesize_approx if is_sabr(stream) else stream.filesize
+
+def download_stream(session, yt, stream, total_size, out_path, counter):
+    if not is_sabr(stream):
+        return ranged_download(session, stream.url, total_size, out_path, counter=counter)
+
+    # pytubefix's own downloader speaks SABR; its progress callback feeds the same
+    # counter (concurrent tracks share one counter) and is where a cancel lands
+    def on_chunk(_stream, chunk, bytes_remaining):
+        if counter.cancelled.is_set():
+            raise DownloadCancelled()
+        counter.add(len(chunk))
+
+    yt.register_on_progress_callback(on_chunk)
+    return stream.download(output_path=os.path.dirname(out_path), filename=os.path.basename(out_path), skip_existing=False)
+
+def run_in_background(target, counter, on_progress):
+    # Network I/O runs on a worker thread; this (script) thread only drains progress and renders
+    outcome = {}
+    def worker():
+        try:
+            outcome['result'] = target()
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    try:
+        while thread.is_alive():
+            try:
+                done, total = counter.updates.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            on_progress(None, None, total - done)
+    finally:
+        # If this thread was interrupted (e.g. a Streamlit rerun raised from on_progress),
+        # stop the workers before the caller's temp files are removed under them
+        counter.cancelled.set()
+        thread.join()
+
+    if 'error' in outcome:
+        raise outcome['error']
+    on_progress(None, None, counter.total - counter.value)
+    return outcome['result']
 
 # Initialize global monitor in session state if not present
 if 'monitor' not in st.session_state:
     st.session_state.monitor = DownloadMonitor()
 
+# Shared HTTP session so video and audio downloads reuse warm keep-alive connections
+if 'http' not in st.session_state:
+    st.session_state.http = requests.Session()
+    st.session_state.http.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=3))
+
 # --- Helper Functions ---
 def get_download_folder():
     return str(Path.home() / "Downloads")
 
+# Characters Windows/macOS refuse in filenames, stripped in one C-level pass
+_BAD_FILENAME_CHARS = str.maketrans('', '', '<>:"/\\|?*')
+
 def sanitize_filename(name):
-    return re.sub(r'[<>:"/\\|?*]', '', name)
+    return name.translate(_BAD_FILENAME_CHARS)
+
+# Codecs that can be stream-copied into an MP4 container as-is
+MP4_AUDIO_CODECS = {'aac', 'mp3'}
+MP4_VIDEO_CODECS = {'h264', 'hevc', 'av1', 'vp9', 'mpeg4'}
 
-def merge_audio_video(video_path, audio_path, output_path):
+def probe_codec(path, stream='a:0'):
     try:
-        cmd = [
-            'ffmpeg', '-y',
-            '-i', video_path,
-            '-i', audio_path,
-            '-c:v', 'copy',
-            '-c:a', 'aac',
-            output_path
-        ]
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-select_streams', stream,
+             '-show_entries', 'stream=codec_name', '-of', 'csv=p=0', path],
+            check=True, capture_output=True, text=True
+        )
+        return result.stdout.strip()
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        return None
+
+# H.264 encoders for video MP4 can't hold, hardware first (checked in this order)
+H264_ENCODER_ARGS = {
+    'h264_nvenc': ['-c:v', 'h264_nvenc', '-preset', 'p4'],
+    'h264_qsv': ['-c:v', 'h264_qsv', '-preset', 'medium'],
+    'h264_videotoolbox': ['-c:v', 'h264_videotoolbox', '-q:v', '65'],
+    'libx264': ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '18'],
+}
+
+def detect_hw_encoder():
+    # Compiled-in encoders only; a transcode still falls back to libx264 if the device is missing
+    try:
+        result = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'], check=True, capture_output=True, text=True)
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        return None
+    for name in H264_ENCODER_ARGS:
+        if name != 'libx264' and name in result.stdout:
+            return name
+    return None
+
+def get_hw_encoder():
+    # Detected on first transcode only, then cached for the session
+    if 'hw_enc' not in st.session_state:
+        st.session_state.hw_enc = detect_hw_encoder()
+    return st.session_state.hw_enc
+
+def run_ffmpeg(cmd, duration=0, on_progress=None):
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+    # Keep only the tail of stderr for error reporting; drain it on a thread so a chatty
+    # ffmpeg can't fill the pipe and stall while we read progress from stdout
+    stderr_tail = deque(maxlen=20)
+    drain = threading.Thread(target=stderr_tail.extend, args=(proc.stderr,), daemon=True)
+    drain.start()
+
+    # ffmpeg emits key=value blocks, each closed by a progress= line
+    try:
+        out_time_us = 0
+        out_size = 0
+        last_ns = 0
+        for line in proc.stdout:
+            key, _, value = line.strip().partition('=')
+            if key == 'out_time_ms' and value.isdigit():
+                out_time_us = int(value) # Microseconds, despite the name
+            elif key == 'total_size' and value.isdigit():
+                out_size = int(value)
+            elif key == 'progress' and on_progress and duration:
+                # Same 50ms coalescing as the download monitor
+                now_ns = time.monotonic_ns()
+                if now_ns - last_ns >= 50_000_000 or value == 'end':
+                    on_progress(min(out_time_us / (duration * 1_000_000), 1.0), out_size)
+                    last_ns = now_ns
+    except BaseException:
+        # Includes Streamlit's rerun/stop exceptions raised from on_progress
+        proc.kill()
+        proc.wait()
+        raise
+    proc.wait()
+    drain.join()
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=''.join(stderr_tail))
+
+AUDIO_COPY_ARGS = ['-c:a', 'copy']
+AUDIO_AAC_ARGS = ['-c:a', 'aac', '-b:a', '192k']
+
+def merge_cmd(video_path, audio_path, output_path, video_args, audio_args, mp4_inputs=False):
+    # MP4 inputs are a pure remux: whatever audio an MP4 carries (AAC, AC-3, E-AC-3, ...)
+    # can be stream-copied back into MP4, so there is nothing to probe
+    input_args = ['-f', 'mp4'] if mp4_inputs else []
+    return [
+        'ffmpeg', '-y',
+        *input_args, '-i', video_path,
+        *input_args, '-i', audio_path,
+        *video_args,
+        *audio_args,
+        '-movflags', '+faststart',
+        '-threads', '0',
+        '-progress', 'pipe:1', '-nostats',
+        output_path
+    ]
+
+def merge_audio_video(video_path, audio_path, output_path, duration=0, on_progress=None, mp4_inputs=False):
+    # Copy the audio when MP4 can hold it, otherwise re-encode to AAC on all cores
+    if mp4_inputs or probe_codec(audio_path, 'a:0') in MP4_AUDIO_CODECS:
+        audio_args = AUDIO_COPY_ARGS
+    else:
+        audio_args = AUDIO_AAC_ARGS
+    # Video is always stream-copied unless ffprobe reports a codec MP4 cannot hold;
+    # any other ffmpeg failure (e.g. a corrupt input) is reported, not transcoded
+    video_codec = None if mp4_inputs else probe_codec(video_path, 'v:0')
+    if video_codec and video_codec not in MP4_VIDEO_CODECS:
+        video_attempts = [H264_ENCODER_ARGS[enc] for enc in (get_hw_encoder(), 'libx264') if enc]
+    else:
+        video_attempts = [['-c:v', 'copy']]
+    try:
+        # Only a transcode has a second attempt: hardware encoder, then libx264
+        for attempt, video_args in enumerate(video_attempts, 1):
+            try:
+                run_ffmpeg(merge_cmd(video_path, audio_path, output_path, video_args, audio_args, mp4_inputs), duration, on_progress)
+                break
+            except subprocess.CalledProcessError:
+                if attempt == len(video_attempts): raise
         return True
     except FileNotFoundError:
         st.error("❌ FFmpeg not found! Please install FFmpeg.")
@@ -105,6 +415,139 @@ def merge_audio_video(video_path, audio_path, output_path):
         st.error(f"❌ Error merging files: {e}")
         return False
 
+def _is_pipe_demux_error(stderr, pipes):
+    # ffmpeg's own input errors, e.g. for an MP4 whose moov atom sits at the end of the
+    # file where a pipe can't seek back to it. The demuxer line names no file, the
+    # "Invalid data" line is prefixed with the input's path
+    for line in (stderr or '').splitlines():
+        if 'moov atom not found' in line:
+            return True
+        if 'Invalid data found when processing input' in line and any(p in line for p in pipes):
+            return True
+    return False
+
+class PipeDemuxError(Exception):
+    # The pipe path can't be used (no FIFO support, or ffmpeg could not read the
+    # tracks from pipes); the temp-file path may still work
+    pass
+
+def merge_from_pipes(session, video_url, video_size, audio_url, audio_size, output_path,
+                     counter, duration=0, on_progress=None, mp4_inputs=False):
+    # POSIX only: ffmpeg reads both tracks from FIFOs while they download, so the
+    # tracks are never written to disk and read back. Inputs can be read only once,
+    # so there is no probing (audio from an MP4 input is copied as-is, audio from any
+    # other container is re-encoded to AAC) and no retry.
+    # Raises PipeDemuxError only when FIFOs can't be created or ffmpeg gave up reading
+    # them, so the caller can retry via temp files; download errors are raised as-is.
+    # The FIFOs carry no data at rest, so they go under the system temp dir: the download
+    # folder may be vfat/exFAT, SMB or WSL /mnt/c, which refuse FIFOs. Only output_path
+    # has to share a filesystem with the final file.
+    pipe_dir = tempfile.mkdtemp(prefix="zenith_pipes_")
+    try:
+        video_pipe = os.path.join(pipe_dir, "video.pipe")
+        audio_pipe = os.path.join(pipe_dir, "audio.pipe")
+        try:
+            os.mkfifo(video_pipe)
+            os.mkfifo(audio_pipe)
+        except OSError as e:
+            raise PipeDemuxError(f"Named pipes are not supported here: {e}") from e
+
+        def feed(url, size, pipe):
+            with open(pipe, 'wb') as f:
+                stream_ranged_download(session, url, size, f, counter=counter)
+
+        audio_args = AUDIO_COPY_ARGS if mp4_inputs else AUDIO_AAC_ARGS
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            feeders = [
+                pool.submit(feed, video_url, video_size, video_pipe),
+                pool.submit(feed, audio_url, audio_size, audio_pipe),
+            ]
+            ffmpeg_error = None
+            try:
+                run_ffmpeg(merge_cmd(video_pipe, audio_pipe, output_path, ['-c:v', 'copy'], audio_args, mp4_inputs), duration, on_progress)
+            except subprocess.CalledProcessError as e:
+                ffmpeg_error = e
+            finally:
+                # ffmpeg is gone by now (run_ffmpeg kills it when interrupted), so any feeder
+                # still running has no reader: stop its fetches, and for one stuck in open()
+                # open and drop the read end so its write fails with BrokenPipeError instead
+                if not all(f.done() for f in feeders):
+                    counter.cancelled.set()
+                while not all(f.done() for f in feeders):
+                    for pipe in (video_pipe, audio_pipe):
+                        os.close(os.open(pipe, os.O_RDONLY | os.O_NONBLOCK))
+                    wait(feeders, timeout=0.1)
+        # A real download error (HTTP 403, timeout, ...) is the cause, whatever ffmpeg did
+        for f in feeders:
+            err = f.exception()
+            if err and not isinstance(err, (BrokenPipeError, DownloadCancelled)):
+                raise err
+        if ffmpeg_error:
+            # Only an input/demux error on one of the pipes says the temp-file path could
+            # do better; a failing encoder or a full disk would fail there too
+            if _is_pipe_demux_error(ffmpeg_error.stderr, (video_pipe, audio_pipe)):
+                raise PipeDemuxError("ffmpeg could not read the tracks from pipes") from ffmpeg_error
+            raise ffmpeg_error
+        # ffmpeg can exit cleanly on a truncated input, so a failed feeder still fails the merge
+        for f in feeders:
+            f.result()
+    finally:
+        shutil.rmtree(pipe_dir, ignore_errors=True)
+
+# --- Helper: Stream Options (cached per video) ---
+def _approx_size(fmt):
+    # Same estimate pytubefix uses for filesize_approx when contentLength is absent
+    if fmt.get('contentLength'):
+        return int(fmt['contentLength'])
+    return int(int(fmt.get('approxDurationMs', 0)) * int(fmt.get('bitrate', 0)) / 8000)
+
+def _resolution(fmt):
+    # Nominal resolution as pytubefix names it ("1080p"), also for vertical or
+    # letterboxed video: qualityLabel without its fps/HDR suffix ("1080p60 HDR"),
+    # else the short side of the frame
+    digits = fmt.get('qualityLabel', '').partition('p')[0]
+    if digits.isdigit():
+        return int(digits)
+    return min(fmt.get('width') or fmt['height'], fmt['height'])
+
+@st.cache_data(ttl=600, show_spinner=False)
+def get_stream_options(url, _yt):
+    # Works on the raw player-response formats; Stream objects are only
+    # built (by itag) when a download starts
+    streaming_data = _yt.streaming_data
+    progressive = streaming_data.get('formats', [])
+    adaptive = streaming_data.get('adaptiveFormats', [])
+
+    # We assume the best audio track is used for merging
+    audio_formats = [f for f in adaptive if f.get('mimeType', '').startswith('audio/')]
+    best_audio = max(audio_formats, key=lambda f: f.get('bitrate', 0), default=None)
+
+    # Progressive first so the stable sort prefers a stream that already has audio
+    video_formats = [
+        (f, is_progressive)
+        for formats, is_progressive in ((progressive, True), (adaptive, False))
+        for f in formats
+        if f.get('mimeType', '').startswith('video/mp4') and f.get('height')
+    ]
+    video_formats.sort(key=lambda item: _resolution(item[0]), reverse=True)
+
+    # Sizes here only label the dropdown; exact sizes are read at download time
+    resolutions = {}
+    for fmt, is_progressive in video_formats:
+        res = f"{_resolution(fmt)}p"
+        if res not in resolutions:
+            resolutions[res] = {
+                'itag': fmt['itag'],
+                'filesize': _approx_size(fmt),
+                'is_progressive': is_progressive,
+            }
+
+    return {
+        'resolutions': resolutions,
+        'best_audio_itag': best_audio['itag'] if best_audio else None,
+        'audio_size': _approx_size(best_audio) if best_audio else 0,
+    }
+
 # --- UI Header ---
 st.title("⚡ Zenith Auto-Saver")
 st.write("Paste link -> Select Quality -> Auto-saves to your Downloads folder.")
@@ -115,10 +558,12 @@ fetch_clicked = st.button("Download")
 
 if url and (fetch_clicked or 'yt_obj' in st.session_state):
     try:
-        if fetch_clicked:
+        # Refetch when the URL changes, or on an explicit click (refreshes expired
+        # googlevideo URLs); other reruns reuse the cached object
+        if fetch_clicked or st.session_state.get('yt_url') != url:
             with st.spinner("🔍 Fetching video details..."):
-                # Hook the monitor's callback here
-                st.session_state.yt_obj = YouTube(url, on_progress_callback=st.session_state.monitor.on_progress)
+                st.session_state.yt_obj = YouTube(url)
+                st.session_state.yt_url = url
         
         yt = st.session_state.yt_obj
 
@@ -135,16 +580,9 @@ if url and (fetch_clicked or 'yt_obj' in st.session_state):
         st.write("### ⚙️ Select Quality")
 
         # Get Audio Size Reference (for High Res calc)
-        # We assume the best audio track is used for merging
-        best_audio = yt.streams.filter(only_audio=True).order_by('abr').desc().first()
-        audio_size = best_audio.filesize if best_audio else 0
-
-        resolutions = {}
-        all_streams = yt.streams.filter(file_extension='mp4', type='video').order_by('resolution').desc()
-        
-        for s in all_streams:
-            if s.resolution and s.resolution not in resolutions:
-                resolutions[s.resolution] = s
+        stream_options = get_stream_options(yt.watch_url, yt)
+        audio_size = stream_options['audio_size']
+        resolutions = stream_options['resolutions']
 
         if not resolutions:
             st.warning("No suitable streams found.")
@@ -152,24 +590,24 @@ if url and (fetch_clicked or 'yt_obj' in st.session_state):
             # Build Dropdown Labels with File Size
             res_options = {}
             for res, stream in resolutions.items():
-                is_adaptive = not stream.is_progressive
+                is_adaptive = not stream['is_progressive']
                 
                 # Estimate total size
                 if is_adaptive:
-                    est_size = stream.filesize + audio_size
+                    est_size = stream['filesize'] + audio_size
                     label = f"{res} (High Res) - ~{format_bytes(est_size)}"
                 else:
-                    est_size = stream.filesize
-                    label = f"{res} (Standard) - {format_bytes(est_size)}"
+                    est_size = stream['filesize']
+                    label = f"{res} (Standard) - ~{format_bytes(est_size)}"
                 
                 res_options[label] = res
 
             selected_label = st.selectbox("Choose Resolution", list(res_options.keys()))
             selected_res = res_options[selected_label]
-            selected_stream = resolutions[selected_res]
+            selected = resolutions[selected_res]
 
             # --- Step 3: Auto-Save Logic ---
-            is_adaptive = not selected_stream.is_progressive
+            is_adaptive = not selected['is_progressive']
             action_text = f"⬇️ Download {selected_res}"
             
             if st.button(action_text):
@@ -178,28 +616,85 @@ if url and (fetch_clicked or 'yt_obj' in st.session_state):
                 progress_bar = st.progress(0)
                 
                 save_path = get_download_folder()
+                os.makedirs(save_path, exist_ok=True) # Downloads no longer go through Stream.download(), which created it
+                selected_stream = yt.streams.get_by_itag(selected['itag'])
                 clean_filename = sanitize_filename(selected_stream.default_filename)
                 final_path = os.path.join(save_path, clean_filename)
 
                 try:
                     if is_adaptive:
-                        # 1. Video Download
-                        st.session_state.monitor.set_ui(progress_bar, status_text, selected_stream.filesize)
-                        status_text.text("⬇️ Phase 1/3: Downloading Video Track...")
-                        video_path = selected_stream.download(output_path=save_path, filename_prefix="temp_video_")
-                        
-                        # 2. Audio Download
-                        st.session_state.monitor.set_ui(progress_bar, status_text, audio_size)
-                        status_text.text("⬇️ Phase 2/3: Downloading Audio Track...")
-                        audio_path = best_audio.download(output_path=save_path, filename_prefix="temp_audio_")
-
-                        # 3. Merge
-                        with st.spinner("⚙️ Phase 3/3: Merging Audio & Video (this may take a moment)..."):
-                            success = merge_audio_video(video_path, audio_path, final_path)
-                        
-                        # Cleanup
-                        if os.path.exists(video_path): os.remove(video_path)
-                        if os.path.exists(audio_path): os.remove(audio_path)
+                        best_audio = yt.streams.get_by_itag(stream_options['best_audio_itag'])
+                        # Exact sizes: the byte ranges must cover the real stream length
+                        video_size = stream_size(selected_stream)
+                        audio_size = stream_size(best_audio)
+                        total_size = video_size + audio_size
+                        http = st.session_state.http # Worker threads have no Streamlit script context
+
+                        mp4_inputs = selected_stream.subtype == 'mp4' and best_audio.subtype == 'mp4'
+
+                        # Portable path: both tracks to temp files (concurrently, one combined progress bar), then remux
+                        def download_and_merge(tmp, merged_path):
+                            video_path = os.path.join(tmp, "video." + selected_stream.subtype)
+                            audio_path = os.path.join(tmp, "audio." + best_audio.subtype)
+                            counter = ByteCounter(total_size)
+
+                            # 1. Video & Audio Download
+                            def download_tracks():
+                                with ThreadPoolExecutor(max_workers=2) as pool:
+                                    video_job = pool.submit(download_stream, http, yt, selected_stream, video_size, video_path, counter)
+                                    audio_job = pool.submit(download_stream, http, yt, best_audio, audio_size, audio_path, counter)
+                                    return video_job.result(), audio_job.result()
+
+                            st.session_state.monitor.set_ui(progress_bar, status_text, total_size)
+                            status_text.text("⬇️ Phase 1/2: Downloading Video & Audio Tracks...")
+                            run_in_background(download_tracks, counter, st.session_state.monitor.on_progress)
+
+                            # 2. Merge
+                            def show_merge_progress(pct, size):
+                                progress_bar.progress(pct)
+                                status_text.markdown(f"""
+                                    <span style="color:#4CAF50"><b>⚙️ Phase 2/2: Merging Audio & Video... {int(pct*100)}%</b></span><br>
+                                    <span class="info-text">📦 {format_bytes(size)} written</span>
+                                """, unsafe_allow_html=True)
+
+                            progress_bar.progress(0)
+                            status_text.text("⚙️ Phase 2/2: Merging Audio & Video...")
+                            return merge_audio_video(
+                                video_path, audio_path, merged_path, yt.length, show_merge_progress, mp4_inputs
+                            )
+
+                        # All intermediate files live in a scratch dir next to the final file:
+                        # same filesystem for the closing rename, and removed even on errors
+                        with tempfile.TemporaryDirectory(dir=save_path, prefix="temp_") as tmp:
+                            merged_path = os.path.join(tmp, "out.mp4")
+                            success = False
+                            # SABR tracks can only be fetched by pytubefix into a file
+                            use_temp_files = not hasattr(os, 'mkfifo') or is_sabr(selected_stream) or is_sabr(best_audio)
+
+                            # Fast path (POSIX): download straight into ffmpeg through named pipes
+                            if not use_temp_files:
+                                counter = ByteCounter(total_size)
+                                st.session_state.monitor.set_ui(progress_bar, status_text, total_size)
+                                status_text.text("⬇️ Downloading & Merging Video + Audio...")
+                                try:
+                                    merge_from_pipes(
+                                        http, selected_stream.url, video_size, best_audio.url, audio_size,
+                                        merged_path, counter, yt.length,
+                                        lambda pct, size: st.session_state.monitor.on_progress(None, None, counter.total - counter.value),
+                                        mp4_inputs
+                                    )
+                                    success = True
+                                except FileNotFoundError:
+                                    st.error("❌ FFmpeg not found! Please install FFmpeg.")
+                                except subprocess.CalledProcessError as e:
+                                    st.error(f"❌ Error merging files: {e}")
+                                except PipeDemuxError:
+                                    use_temp_files = True # A container ffmpeg can't demux from a pipe: redo it via temp files
+
+                            if use_temp_files:
+                                success = download_and_merge(tmp, merged_path)
+                            if success:
+                                os.replace(merged_path, final_path)
 
                         if success:
                             progress_bar.progress(100)
@@ -208,9 +703,23 @@ if url and (fetch_clicked or 'yt_obj' in st.session_state):
                             st.balloons()
                     else:
                         # Standard Download
-                        st.session_state.monitor.set_ui(progress_bar, status_text, selected_stream.filesize)
-                        status_text.text("⬇️ Downloading Standard Stream...")
-                        out_file = selected_stream.download(output_path=save_path, filename=clean_filename)
+                        video_size = stream_size(selected_stream)
+                        # Same skip_existing rule as pytubefix: an existing file of the right size is kept
+                        if not (os.path.isfile(final_path) and os.path.getsize(final_path) == video_size):
+                            counter = ByteCounter(video_size)
+                            http = st.session_state.http
+                            st.session_state.monitor.set_ui(progress_bar, status_text, video_size)
+                            status_text.text("⬇️ Downloading Standard Stream...")
+                            # Stage next to the final file so a failed download never leaves a
+                            # zero-padded file under the real name
+                            with tempfile.TemporaryDirectory(dir=save_path, prefix="temp_") as tmp:
+                                tmp_path = os.path.join(tmp, "video." + selected_stream.subtype)
+                                run_in_background(
+                                    lambda: download_stream(http, yt, selected_stream, video_size, tmp_path, counter),
+                                    counter, st.session_state.monitor.on_progress
+                                )
+                                os.replace(tmp_path, final_path)
+                        out_file = final_path
                         
                         progress_bar.progress(100)
                         status_text.markdown("### ✅ Download Complete!")